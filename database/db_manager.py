@@ -1,5 +1,27 @@
 """
 Database Manager for Meituan Crawler
+v4.4 - Large saves (WAL_CHECKPOINT_ROWS+) end with PRAGMA wal_checkpoint(TRUNCATE)
+v4.3 - Business summary rows built with itemgetter; save loop uses locals
+v4.2 - get_equity_sales_iter streams sales records; get_equity_sales builds on it
+v4.1 - Writers from every thread share one connection; readers keep one per thread
+v4.0 - data_exists probes with SELECT 1 ... LIMIT 1 instead of COUNT(*)
+v3.9 - Batch UPSERTs bind one per-save timestamp instead of CURRENT_TIMESTAMP per row
+v3.8 - Save batches are written in UNIQUE-key order
+v3.7 - sqlite3.Row only on cursors that build dicts; other reads use plain tuples
+v3.6 - Per-record log calls use lazy %-style arguments
+v3.5 - Dish sales parameter tuples built with one itemgetter call per row
+v3.4 - revenue/order_count null-fill moved into the business summary SQL (COALESCE)
+v3.3 - Autocommit connections (isolation_level=None); write transactions are explicit
+v3.2 - Dropped indexes duplicated by the UNIQUE constraints' autoindexes (schema 2)
+v3.1 - force_update skips rows whose values are unchanged (counted as skipped)
+v3.0 - Schema setup skipped when PRAGMA user_version is current (no DDL per startup)
+v2.9 - Only writers take the lock; reads run concurrently (get_connection(write=True))
+v2.8 - save_equity_package_sales upserts each distinct store once per batch
+v2.7 - Save SQL hoisted to module constants; prepared-statement cache raised to 256
+v2.6 - Batch writes commit every WRITE_BATCH_SIZE rows in BEGIN IMMEDIATE transactions
+v2.5 - Reuse one connection per thread instead of connecting on every call
+v2.4 - save_* methods write each batch with one executemany UPSERT (no per-record SELECT)
+v2.3 - WAL journal mode plus per-connection tuning PRAGMAs; PRAGMA optimize on close
 v2.2 - Added mt_business_summary table for 综合营业统计 report
 
 Tables:
@@ -15,11 +37,13 @@ Duplicate Handling Logic:
 
 import sqlite3
 import logging
+import weakref
+from operator import itemgetter
 from pathlib import Path
-from typing import List, Dict, Optional, Any
-from datetime import datetime
-from contextlib import contextmanager
-from threading import Lock
+from typing import List, Dict, Optional, Any, Iterator
+from datetime import datetime, timezone
+from contextlib import contextmanager, nullcontext
+from threading import Lock, local
 
 # Configure logging
 logging.basicConfig(
@@ -28,6 +52,266 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Bump when _init_db changes the schema; databases already at this
+# PRAGMA user_version skip table/index creation and migrations entirely
+SCHEMA_VERSION = 2
+
+# Rows per write transaction: bounds how long a save holds the write lock
+WRITE_BATCH_SIZE = 500
+
+# Saves of at least this many rows checkpoint and truncate the WAL afterwards
+WAL_CHECKPOINT_ROWS = 5000
+
+# ==================== SQL ====================
+# Module-level so every call passes the identical string and hits the
+# connection's prepared-statement cache instead of re-parsing.
+# Batch UPSERTs take created_at/updated_at as their last parameter (bound
+# twice via ?N), computed once per save by _utc_timestamp() instead of
+# evaluating CURRENT_TIMESTAMP for every row.
+
+# Sort keys over each UPSERT's parameter tuple, matching the table's UNIQUE
+# constraint. Rows are written in conflict-key order so consecutive lookups
+# and inserts touch neighbouring index pages. The sort is stable, so
+# duplicates within a batch keep their relative order.
+_EQUITY_SALES_CONFLICT_KEY = itemgetter(0, 1, 2)        # org_code, date, package_name
+_BUSINESS_SUMMARY_CONFLICT_KEY = itemgetter(1, 2)       # store_name, business_date
+_DISH_SALES_CONFLICT_KEY = itemgetter(0, 2, 3)          # store_name, business_date, dish_name
+
+_UPSERT_STORE_SQL = """
+    INSERT INTO mt_stores (org_code, store_name)
+    VALUES (?, ?)
+    ON CONFLICT(org_code)
+    DO UPDATE SET
+        store_name = excluded.store_name,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+# INSERT new records; UPDATE existing ones only if new values are higher
+_UPSERT_EQUITY_SALES_SQL = """
+    INSERT INTO mt_equity_package_sales
+    (org_code, date, package_name, unit_price, quantity_sold,
+     total_sales, refund_quantity, refund_amount, created_at, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?9, ?9)
+    ON CONFLICT(org_code, date, package_name) DO UPDATE SET
+        unit_price = excluded.unit_price,
+        quantity_sold = excluded.quantity_sold,
+        total_sales = excluded.total_sales,
+        refund_quantity = excluded.refund_quantity,
+        refund_amount = excluded.refund_amount,
+        updated_at = excluded.updated_at
+    WHERE excluded.quantity_sold > mt_equity_package_sales.quantity_sold
+       OR excluded.total_sales > mt_equity_package_sales.total_sales
+"""
+
+# Base statement; always used with one of the WHERE clauses below.
+# revenue and order_count are null-filled in SQL (COALESCE) rather than per row.
+_UPSERT_BUSINESS_SUMMARY_SQL = """
+    INSERT INTO mt_business_summary
+    (city, store_name, business_date, store_created_at, operating_days,
+     revenue, discount_amount, business_income, order_count, diner_count,
+     table_count, per_capita_before_discount, per_capita_after_discount,
+     avg_order_before_discount, avg_order_after_discount,
+     table_opening_rate, table_turnover_rate, occupancy_rate,
+     avg_dining_time, composition_data, created_at, updated_at)
+    VALUES (?, ?, ?, ?, ?, COALESCE(?, 0), ?, ?, COALESCE(?, 0), ?,
+            ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?21, ?21)
+    ON CONFLICT(store_name, business_date) DO UPDATE SET
+        city = excluded.city,
+        store_created_at = excluded.store_created_at,
+        operating_days = excluded.operating_days,
+        revenue = excluded.revenue,
+        discount_amount = excluded.discount_amount,
+        business_income = excluded.business_income,
+        order_count = excluded.order_count,
+        diner_count = excluded.diner_count,
+        table_count = excluded.table_count,
+        per_capita_before_discount = excluded.per_capita_before_discount,
+        per_capita_after_discount = excluded.per_capita_after_discount,
+        avg_order_before_discount = excluded.avg_order_before_discount,
+        avg_order_after_discount = excluded.avg_order_after_discount,
+        table_opening_rate = excluded.table_opening_rate,
+        table_turnover_rate = excluded.table_turnover_rate,
+        occupancy_rate = excluded.occupancy_rate,
+        avg_dining_time = excluded.avg_dining_time,
+        composition_data = excluded.composition_data,
+        updated_at = excluded.updated_at
+"""
+
+# Parameter order of _UPSERT_BUSINESS_SUMMARY_SQL, and the value used for a
+# missing key (an explicit None is kept). revenue/order_count default to None
+# because the SQL null-fills them.
+_BUSINESS_SUMMARY_DEFAULTS = {
+    'city': '', 'store_name': '', 'business_date': '', 'store_created_at': '',
+    'operating_days': 0, 'revenue': None, 'discount_amount': 0,
+    'business_income': 0, 'order_count': None, 'diner_count': 0,
+    'table_count': 0, 'per_capita_before_discount': 0,
+    'per_capita_after_discount': 0, 'avg_order_before_discount': 0,
+    'avg_order_after_discount': 0, 'table_opening_rate': '',
+    'table_turnover_rate': 0, 'occupancy_rate': '', 'avg_dining_time': 0,
+    'composition_data': '{}', 'updated_at': None,
+}
+_BUSINESS_SUMMARY_PARAMS = itemgetter(*_BUSINESS_SUMMARY_DEFAULTS)
+
+# Only overwrite when the new crawl has higher revenue or order count
+_UPSERT_BUSINESS_SUMMARY_IF_HIGHER_SQL = _UPSERT_BUSINESS_SUMMARY_SQL + """
+    WHERE excluded.revenue > COALESCE(mt_business_summary.revenue, 0)
+       OR excluded.order_count > COALESCE(mt_business_summary.order_count, 0)
+"""
+
+# force_update: overwrite, but leave rows that would not change untouched
+# (no updated_at bump, no page write)
+_UPSERT_BUSINESS_SUMMARY_IF_CHANGED_SQL = _UPSERT_BUSINESS_SUMMARY_SQL + """
+    WHERE excluded.city IS NOT mt_business_summary.city
+       OR excluded.store_created_at IS NOT mt_business_summary.store_created_at
+       OR excluded.operating_days IS NOT mt_business_summary.operating_days
+       OR excluded.revenue IS NOT mt_business_summary.revenue
+       OR excluded.discount_amount IS NOT mt_business_summary.discount_amount
+       OR excluded.business_income IS NOT mt_business_summary.business_income
+       OR excluded.order_count IS NOT mt_business_summary.order_count
+       OR excluded.diner_count IS NOT mt_business_summary.diner_count
+       OR excluded.table_count IS NOT mt_business_summary.table_count
+       OR excluded.per_capita_before_discount IS NOT mt_business_summary.per_capita_before_discount
+       OR excluded.per_capita_after_discount IS NOT mt_business_summary.per_capita_after_discount
+       OR excluded.avg_order_before_discount IS NOT mt_business_summary.avg_order_before_discount
+       OR excluded.avg_order_after_discount IS NOT mt_business_summary.avg_order_after_discount
+       OR excluded.table_opening_rate IS NOT mt_business_summary.table_opening_rate
+       OR excluded.table_turnover_rate IS NOT mt_business_summary.table_turnover_rate
+       OR excluded.occupancy_rate IS NOT mt_business_summary.occupancy_rate
+       OR excluded.avg_dining_time IS NOT mt_business_summary.avg_dining_time
+       OR excluded.composition_data IS NOT mt_business_summary.composition_data
+"""
+
+# Base statement; always used with one of the WHERE clauses below
+_UPSERT_DISH_SALES_SQL = """
+    INSERT INTO mt_dish_sales (
+        store_name, org_code, business_date, dish_name,
+        sales_quantity, sales_quantity_pct,
+        price_before_discount, price_after_discount,
+        sales_amount, sales_amount_pct,
+        discount_amount, dish_discount_pct,
+        dish_income, dish_income_pct,
+        order_quantity, order_amount,
+        return_quantity, return_amount,
+        return_quantity_pct, return_amount_pct,
+        return_rate, return_order_count,
+        gift_quantity, gift_amount,
+        gift_quantity_pct, gift_amount_pct,
+        dish_order_count, related_order_amount,
+        sales_per_thousand, order_rate, customer_click_rate,
+        created_at, updated_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?32, ?32)
+    ON CONFLICT(store_name, business_date, dish_name) DO UPDATE SET
+        org_code = excluded.org_code,
+        sales_quantity = COALESCE(excluded.sales_quantity, 0),
+        sales_quantity_pct = excluded.sales_quantity_pct,
+        price_before_discount = excluded.price_before_discount,
+        price_after_discount = excluded.price_after_discount,
+        sales_amount = COALESCE(excluded.sales_amount, 0),
+        sales_amount_pct = excluded.sales_amount_pct,
+        discount_amount = excluded.discount_amount,
+        dish_discount_pct = excluded.dish_discount_pct,
+        dish_income = excluded.dish_income,
+        dish_income_pct = excluded.dish_income_pct,
+        order_quantity = excluded.order_quantity,
+        order_amount = excluded.order_amount,
+        return_quantity = excluded.return_quantity,
+        return_amount = excluded.return_amount,
+        return_quantity_pct = excluded.return_quantity_pct,
+        return_amount_pct = excluded.return_amount_pct,
+        return_rate = excluded.return_rate,
+        return_order_count = excluded.return_order_count,
+        gift_quantity = excluded.gift_quantity,
+        gift_amount = excluded.gift_amount,
+        gift_quantity_pct = excluded.gift_quantity_pct,
+        gift_amount_pct = excluded.gift_amount_pct,
+        dish_order_count = excluded.dish_order_count,
+        related_order_amount = excluded.related_order_amount,
+        sales_per_thousand = excluded.sales_per_thousand,
+        order_rate = excluded.order_rate,
+        customer_click_rate = excluded.customer_click_rate,
+        updated_at = excluded.updated_at
+"""
+
+# Parameter order of _UPSERT_DISH_SALES_SQL. One itemgetter call builds each
+# row's tuple; optional columns default to NULL via _DISH_SALES_DEFAULTS.
+_DISH_SALES_KEYS = (
+    'store_name', 'org_code', 'business_date', 'dish_name',
+    'sales_quantity', 'sales_quantity_pct',
+    'price_before_discount', 'price_after_discount',
+    'sales_amount', 'sales_amount_pct',
+    'discount_amount', 'dish_discount_pct',
+    'dish_income', 'dish_income_pct',
+    'order_quantity', 'order_amount',
+    'return_quantity', 'return_amount',
+    'return_quantity_pct', 'return_amount_pct',
+    'return_rate', 'return_order_count',
+    'gift_quantity', 'gift_amount',
+    'gift_quantity_pct', 'gift_amount_pct',
+    'dish_order_count', 'related_order_amount',
+    'sales_per_thousand', 'order_rate', 'customer_click_rate',
+    'updated_at',
+)
+_DISH_SALES_PARAMS = itemgetter(*_DISH_SALES_KEYS)
+_DISH_SALES_DEFAULTS = dict.fromkeys(
+    k for k in _DISH_SALES_KEYS if k not in ('store_name', 'business_date', 'dish_name')
+)
+
+# force_update: overwrite, but leave rows that would not change untouched
+# (no updated_at bump, no page write)
+_UPSERT_DISH_SALES_IF_CHANGED_SQL = _UPSERT_DISH_SALES_SQL + """
+    WHERE excluded.org_code IS NOT mt_dish_sales.org_code
+       OR COALESCE(excluded.sales_quantity, 0) IS NOT mt_dish_sales.sales_quantity
+       OR excluded.sales_quantity_pct IS NOT mt_dish_sales.sales_quantity_pct
+       OR excluded.price_before_discount IS NOT mt_dish_sales.price_before_discount
+       OR excluded.price_after_discount IS NOT mt_dish_sales.price_after_discount
+       OR COALESCE(excluded.sales_amount, 0) IS NOT mt_dish_sales.sales_amount
+       OR excluded.sales_amount_pct IS NOT mt_dish_sales.sales_amount_pct
+       OR excluded.discount_amount IS NOT mt_dish_sales.discount_amount
+       OR excluded.dish_discount_pct IS NOT mt_dish_sales.dish_discount_pct
+       OR excluded.dish_income IS NOT mt_dish_sales.dish_income
+       OR excluded.dish_income_pct IS NOT mt_dish_sales.dish_income_pct
+       OR excluded.order_quantity IS NOT mt_dish_sales.order_quantity
+       OR excluded.order_amount IS NOT mt_dish_sales.order_amount
+       OR excluded.return_quantity IS NOT mt_dish_sales.return_quantity
+       OR excluded.return_amount IS NOT mt_dish_sales.return_amount
+       OR excluded.return_quantity_pct IS NOT mt_dish_sales.return_quantity_pct
+       OR excluded.return_amount_pct IS NOT mt_dish_sales.return_amount_pct
+       OR excluded.return_rate IS NOT mt_dish_sales.return_rate
+       OR excluded.return_order_count IS NOT mt_dish_sales.return_order_count
+       OR excluded.gift_quantity IS NOT mt_dish_sales.gift_quantity
+       OR excluded.gift_amount IS NOT mt_dish_sales.gift_amount
+       OR excluded.gift_quantity_pct IS NOT mt_dish_sales.gift_quantity_pct
+       OR excluded.gift_amount_pct IS NOT mt_dish_sales.gift_amount_pct
+       OR excluded.dish_order_count IS NOT mt_dish_sales.dish_order_count
+       OR excluded.related_order_amount IS NOT mt_dish_sales.related_order_amount
+       OR excluded.sales_per_thousand IS NOT mt_dish_sales.sales_per_thousand
+       OR excluded.order_rate IS NOT mt_dish_sales.order_rate
+       OR excluded.customer_click_rate IS NOT mt_dish_sales.customer_click_rate
+"""
+
+# Only overwrite when the new crawl has higher quantity or amount
+_UPSERT_DISH_SALES_IF_HIGHER_SQL = _UPSERT_DISH_SALES_SQL + """
+    WHERE COALESCE(excluded.sales_quantity, 0) > COALESCE(mt_dish_sales.sales_quantity, 0)
+       OR COALESCE(excluded.sales_amount, 0) > COALESCE(mt_dish_sales.sales_amount, 0)
+"""
+
+
+def _utc_timestamp() -> str:
+    """Current UTC time in SQLite's CURRENT_TIMESTAMP format."""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _close_connections(connections: List[sqlite3.Connection]) -> None:
+    """Optimize and close cached connections (at exit or when the manager is collected)."""
+    for conn in connections:
+        try:
+            # Refresh query planner statistics if they have gone stale
+            conn.execute("PRAGMA optimize")
+            conn.close()
+        except sqlite3.Error:
+            pass
+    connections.clear()
+
 
 class DatabaseManager:
     """
@@ -43,7 +327,14 @@ class DatabaseManager:
             db_path: Path to the SQLite database file
         """
         self.db_path = Path(db_path)
-        self._lock = Lock()  # Thread safety lock
+        self._write_lock = Lock()  # Serializes writers; readers never wait on it
+
+        # One shared writer connection, used only under _write_lock, plus one
+        # reader connection per thread; all are reused across calls
+        self._writer: Optional[sqlite3.Connection] = None
+        self._local = local()
+        self._connections: List[sqlite3.Connection] = []
+        self._finalizer = weakref.finalize(self, _close_connections, self._connections)
 
         # Ensure database directory exists
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
@@ -55,9 +346,20 @@ class DatabaseManager:
     def _init_db(self):
         """Initialize database and create tables if they don't exist."""
         try:
-            with self.get_connection() as conn:
+            with self.get_connection(write=True) as conn:
                 cursor = conn.cursor()
 
+                cursor.execute("PRAGMA user_version")
+                if cursor.fetchone()[0] >= SCHEMA_VERSION:
+                    return  # Schema already up to date
+
+                # WAL is persistent in the database file: readers no longer block
+                # the writer, and commits need one fsync instead of two
+                cursor.execute("PRAGMA journal_mode = WAL")
+
+                # Apply the whole schema atomically (journal_mode can't change inside it)
+                cursor.execute("BEGIN IMMEDIATE")
+
                 # Create stores table - org_code is primary key
                 cursor.execute("""
                     CREATE TABLE IF NOT EXISTS mt_stores (
@@ -88,21 +390,19 @@ class DatabaseManager:
                 """)
 
                 # Add updated_at column if table exists but column doesn't (migration)
-                try:
+                cursor.execute("""
+                    SELECT 1 FROM pragma_table_info('mt_equity_package_sales')
+                    WHERE name = 'updated_at'
+                """)
+                if cursor.fetchone() is None:
                     cursor.execute("""
                         ALTER TABLE mt_equity_package_sales
                         ADD COLUMN updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                     """)
                     logger.info("Added updated_at column to mt_equity_package_sales")
-                except sqlite3.OperationalError:
-                    pass  # Column already exists
-
-                # Create indexes for better query performance
-                cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_equity_sales_org_date
-                    ON mt_equity_package_sales(org_code, date)
-                """)
 
+                # Create indexes for better query performance.
+                # (org_code, date) lookups use the UNIQUE(org_code, date, package_name) index.
                 cursor.execute("""
                     CREATE INDEX IF NOT EXISTS idx_equity_sales_date
                     ON mt_equity_package_sales(date)
@@ -138,11 +438,6 @@ class DatabaseManager:
                     )
                 """)
 
-                cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_business_summary_store_date
-                    ON mt_business_summary(store_name, business_date)
-                """)
-
                 cursor.execute("""
                     CREATE INDEX IF NOT EXISTS idx_business_summary_date
                     ON mt_business_summary(business_date)
@@ -189,11 +484,6 @@ class DatabaseManager:
                     )
                 """)
 
-                cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_dish_sales_store_date
-                    ON mt_dish_sales(store_name, business_date)
-                """)
-
                 cursor.execute("""
                     CREATE INDEX IF NOT EXISTS idx_dish_sales_date
                     ON mt_dish_sales(business_date)
@@ -204,42 +494,153 @@ class DatabaseManager:
                     ON mt_dish_sales(dish_name)
                 """)
 
-                conn.commit()
+                # Schema 2: drop indexes that duplicate a UNIQUE constraint's
+                # autoindex (same leading columns) and only cost extra writes
+                for index_name in (
+                    "idx_equity_sales_org_date",
+                    "idx_business_summary_store_date",
+                    "idx_dish_sales_store_date"
+                ):
+                    cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+
+                cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                cursor.execute("COMMIT")
                 logger.info("Database tables created successfully")
 
         except sqlite3.Error as e:
             logger.error(f"Database initialization error: {e}")
             raise
 
+    def _connect(self) -> sqlite3.Connection:
+        """Open and configure a new connection."""
+        conn = sqlite3.connect(
+            str(self.db_path),
+            timeout=30.0,
+            check_same_thread=False,
+            cached_statements=256,
+            # Autocommit: sqlite3 issues no implicit BEGINs; writers open their
+            # own BEGIN IMMEDIATE ... COMMIT transactions
+            isolation_level=None
+        )
+        # No connection-wide row_factory: write paths read plain tuples;
+        # methods returning dicts set sqlite3.Row on their own cursor
+        # Enable foreign key constraints
+        conn.execute("PRAGMA foreign_keys = ON")
+        # Per-connection tuning (not persisted in the file)
+        conn.execute("PRAGMA synchronous = NORMAL")  # Safe with WAL
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA cache_size = -65536")  # 64 MB
+        conn.execute("PRAGMA mmap_size = 268435456")  # 256 MB
+        conn.execute("PRAGMA busy_timeout = 30000")
+        return conn
+
     @contextmanager
-    def get_connection(self):
+    def get_connection(self, write: bool = False):
         """
         Context manager for database connections.
         Provides thread-safe database access.
 
+        Connections are opened on first use and reused by later calls; they
+        stay open until close() or interpreter exit.
+
+        Args:
+            write: True if the block writes. All writers share one connection
+                   and are serialized with a lock; readers take no lock and
+                   use their thread's own connection (WAL lets them run
+                   alongside the writer).
+
         Yields:
             sqlite3.Connection: Database connection
         """
-        conn = None
-        try:
-            with self._lock:
-                conn = sqlite3.connect(
-                    str(self.db_path),
-                    timeout=30.0,
-                    check_same_thread=False
-                )
-                conn.row_factory = sqlite3.Row  # Enable column access by name
-                # Enable foreign key constraints
-                conn.execute("PRAGMA foreign_keys = ON")
+        with self._write_lock if write else nullcontext():
+            if write:
+                conn = self._writer
+                if conn is None:
+                    conn = self._writer = self._connect()
+                    self._connections.append(conn)
+            else:
+                conn = getattr(self._local, 'conn', None)
+                if conn is None:
+                    conn = self._connect()
+                    self._local.conn = conn
+                    self._connections.append(conn)
+
+            try:
                 yield conn
-        except sqlite3.Error as e:
-            logger.error(f"Database connection error: {e}")
-            if conn:
+            except sqlite3.Error as e:
+                logger.error(f"Database connection error: {e}")
                 conn.rollback()
-            raise
-        finally:
-            if conn:
-                conn.close()
+                raise
+            except BaseException:
+                # The connection outlives this call: never leave a transaction open on it
+                conn.rollback()
+                raise
+
+    def close(self) -> None:
+        """Close every connection opened by this manager. Later calls reconnect."""
+        self._finalizer()
+        self._writer = None
+        self._local = local()
+        self._finalizer = weakref.finalize(self, _close_connections, self._connections)
+
+    def _upsert_many(
+        self,
+        conn: sqlite3.Connection,
+        table: str,
+        sql: str,
+        rows: List[tuple],
+        stats: Dict[str, int]
+    ) -> None:
+        """
+        Run an INSERT ... ON CONFLICT DO UPDATE statement over rows with executemany.
+
+        Rows are written in transactions of WRITE_BATCH_SIZE, each opened with
+        BEGIN IMMEDIATE (take the write lock up front, fail fast if busy) and
+        committed on its own, so other writers never wait for a whole crawl.
+
+        SQLite does not report per-row outcomes for executemany, so the counts
+        are derived: rows with an id above the previous MAX(id) were inserted,
+        the remaining changes were updates, and rows that changed nothing were
+        skipped by the DO UPDATE ... WHERE clause.
+
+        Args:
+            conn: Open connection with no transaction in progress
+            table: Target table, must have an AUTOINCREMENT id column
+            sql: UPSERT statement with one placeholder per row value
+            rows: Parameter tuples
+            stats: {"inserted", "updated", "skipped"} counts, incremented after
+                   each commit so they match what was saved if a later chunk fails
+        """
+        cursor = conn.cursor()
+        for start in range(0, len(rows), WRITE_BATCH_SIZE):
+            chunk = rows[start:start + WRITE_BATCH_SIZE]
+
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+            max_id = cursor.fetchone()[0]
+            changes_before = conn.total_changes
+
+            cursor.executemany(sql, chunk)
+
+            changed = conn.total_changes - changes_before
+            cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE id > ?", (max_id,))
+            inserted = cursor.fetchone()[0]
+            cursor.execute("COMMIT")
+
+            stats["inserted"] += inserted
+            stats["updated"] += changed - inserted
+            stats["skipped"] += len(chunk) - changed
+
+        if len(rows) >= WAL_CHECKPOINT_ROWS:
+            # Fold the WAL back into the database and reset it to zero bytes so
+            # a big ingest does not leave a large -wal file behind. The rows are
+            # already committed, so a failed checkpoint is only logged.
+            try:
+                busy, _, _ = cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+                if busy:
+                    logger.debug("WAL checkpoint after %d rows blocked by readers", len(rows))
+            except sqlite3.Error as e:
+                logger.warning(f"WAL checkpoint failed: {e}")
 
     # ==================== Store Operations ====================
 
@@ -255,18 +656,9 @@ class DatabaseManager:
             True if successful, False otherwise
         """
         try:
-            with self.get_connection() as conn:
+            with self.get_connection(write=True) as conn:
                 cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO mt_stores (org_code, store_name)
-                    VALUES (?, ?)
-                    ON CONFLICT(org_code)
-                    DO UPDATE SET
-                        store_name = excluded.store_name,
-                        updated_at = CURRENT_TIMESTAMP
-                """, (org_code, store_name))
-
-                conn.commit()
+                cursor.execute(_UPSERT_STORE_SQL, (org_code, store_name))
                 logger.info(f"Saved store: {store_name} ({org_code})")
                 return True
 
@@ -284,6 +676,7 @@ class DatabaseManager:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
+                cursor.row_factory = sqlite3.Row  # Column access by name
                 cursor.execute("""
                     SELECT org_code, store_name, created_at, updated_at
                     FROM mt_stores
@@ -335,90 +728,28 @@ class DatabaseManager:
             return stats
 
         try:
-            with self.get_connection() as conn:
+            with self.get_connection(write=True) as conn:
                 cursor = conn.cursor()
 
-                for record in records:
-                    org_code = record['org_code']
-                    store_name = record['store_name']
-                    date = record['date']
-                    package_name = record['package_name']
-                    new_quantity = record['quantity_sold']
-                    new_sales = record['total_sales']
-
-                    # Ensure store exists first
-                    cursor.execute("""
-                        INSERT INTO mt_stores (org_code, store_name)
-                        VALUES (?, ?)
-                        ON CONFLICT(org_code)
-                        DO UPDATE SET
-                            store_name = excluded.store_name,
-                            updated_at = CURRENT_TIMESTAMP
-                    """, (org_code, store_name))
-
-                    # Check if record exists and get current values
-                    cursor.execute("""
-                        SELECT id, quantity_sold, total_sales
-                        FROM mt_equity_package_sales
-                        WHERE org_code = ? AND date = ? AND package_name = ?
-                    """, (org_code, date, package_name))
-
-                    existing = cursor.fetchone()
-
-                    if existing is None:
-                        # No existing record - INSERT new
-                        cursor.execute("""
-                            INSERT INTO mt_equity_package_sales
-                            (org_code, date, package_name, unit_price, quantity_sold,
-                             total_sales, refund_quantity, refund_amount, created_at, updated_at)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                        """, (
-                            org_code, date, package_name,
-                            record['unit_price'], new_quantity, new_sales,
-                            record.get('refund_quantity', 0),
-                            record.get('refund_amount', 0.0)
-                        ))
-                        stats["inserted"] += 1
-                        logger.debug(f"INSERT: {org_code}/{date}/{package_name} - qty={new_quantity}, sales={new_sales}")
-
-                    else:
-                        # Record exists - check if new values are higher
-                        old_quantity = existing['quantity_sold']
-                        old_sales = existing['total_sales']
-
-                        if new_quantity > old_quantity or new_sales > old_sales:
-                            # New values are higher - UPDATE
-                            cursor.execute("""
-                                UPDATE mt_equity_package_sales
-                                SET unit_price = ?,
-                                    quantity_sold = ?,
-                                    total_sales = ?,
-                                    refund_quantity = ?,
-                                    refund_amount = ?,
-                                    updated_at = CURRENT_TIMESTAMP
-                                WHERE id = ?
-                            """, (
-                                record['unit_price'], new_quantity, new_sales,
-                                record.get('refund_quantity', 0),
-                                record.get('refund_amount', 0.0),
-                                existing['id']
-                            ))
-                            stats["updated"] += 1
-                            logger.debug(
-                                f"UPDATE: {org_code}/{date}/{package_name} - "
-                                f"qty: {old_quantity}->{new_quantity}, sales: {old_sales}->{new_sales}"
-                            )
-
-                        else:
-                            # New values are NOT higher - SKIP
-                            stats["skipped"] += 1
-                            logger.debug(
-                                f"SKIP: {org_code}/{date}/{package_name} - "
-                                f"existing qty={old_quantity} >= new qty={new_quantity}, "
-                                f"existing sales={old_sales} >= new sales={new_sales}"
-                            )
-
-                conn.commit()
+                # Ensure stores exist first (sales rows reference mt_stores).
+                # One upsert per store, not per record; the last name seen wins.
+                stores = {record['org_code']: record['store_name'] for record in records}
+                cursor.execute("BEGIN IMMEDIATE")
+                cursor.executemany(_UPSERT_STORE_SQL, stores.items())
+                cursor.execute("COMMIT")
+
+                now = _utc_timestamp()
+                rows = sorted((
+                    (
+                        record['org_code'], record['date'], record['package_name'],
+                        record['unit_price'], record['quantity_sold'], record['total_sales'],
+                        record.get('refund_quantity', 0),
+                        record.get('refund_amount', 0.0),
+                        now
+                    )
+                    for record in records
+                ), key=_EQUITY_SALES_CONFLICT_KEY)
+                self._upsert_many(conn, "mt_equity_package_sales", _UPSERT_EQUITY_SALES_SQL, rows, stats)
 
                 total = stats["inserted"] + stats["updated"] + stats["skipped"]
                 logger.info(
@@ -460,123 +791,36 @@ class DatabaseManager:
             logger.warning("No business summary records to save")
             return stats
 
-        try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
+        # Hot loop: globals and bound methods hoisted into locals
+        params = _BUSINESS_SUMMARY_PARAMS
+        defaults = _BUSINESS_SUMMARY_DEFAULTS
+        now = _utc_timestamp()
+        rows = []
+        append = rows.append
+        missing = 0
+        for record in records:
+            record = {**defaults, **record, 'updated_at': now}
 
-                for record in records:
-                    store_name = record.get('store_name', '')
-                    business_date = record.get('business_date', '')
-                    new_revenue = record.get('revenue', 0) or 0
-                    new_order_count = record.get('order_count', 0) or 0
+            if not record['store_name'] or not record['business_date']:
+                missing += 1
+                continue
 
-                    if not store_name or not business_date:
-                        logger.warning(f"Skipping record with missing store_name or business_date")
-                        stats["skipped"] += 1
-                        continue
+            append(params(record))
 
-                    # Check if record exists
-                    cursor.execute("""
-                        SELECT id, revenue, order_count
-                        FROM mt_business_summary
-                        WHERE store_name = ? AND business_date = ?
-                    """, (store_name, business_date))
-
-                    existing = cursor.fetchone()
-
-                    if existing is None:
-                        # INSERT new record
-                        cursor.execute("""
-                            INSERT INTO mt_business_summary
-                            (city, store_name, business_date, store_created_at, operating_days,
-                             revenue, discount_amount, business_income, order_count, diner_count,
-                             table_count, per_capita_before_discount, per_capita_after_discount,
-                             avg_order_before_discount, avg_order_after_discount,
-                             table_opening_rate, table_turnover_rate, occupancy_rate,
-                             avg_dining_time, composition_data, created_at, updated_at)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?,
-                                    CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                        """, (
-                            record.get('city', ''),
-                            store_name,
-                            business_date,
-                            record.get('store_created_at', ''),
-                            record.get('operating_days', 0),
-                            new_revenue,
-                            record.get('discount_amount', 0),
-                            record.get('business_income', 0),
-                            new_order_count,
-                            record.get('diner_count', 0),
-                            record.get('table_count', 0),
-                            record.get('per_capita_before_discount', 0),
-                            record.get('per_capita_after_discount', 0),
-                            record.get('avg_order_before_discount', 0),
-                            record.get('avg_order_after_discount', 0),
-                            record.get('table_opening_rate', ''),
-                            record.get('table_turnover_rate', 0),
-                            record.get('occupancy_rate', ''),
-                            record.get('avg_dining_time', 0),
-                            record.get('composition_data', '{}')
-                        ))
-                        stats["inserted"] += 1
-                        logger.debug(f"INSERT: {store_name}/{business_date}")
-
-                    else:
-                        # Check if new values are higher OR force_update is True
-                        old_revenue = existing['revenue'] or 0
-                        old_order_count = existing['order_count'] or 0
-
-                        # Always update to ensure composition_data JSON is refreshed
-                        should_update = (
-                            new_revenue > old_revenue or
-                            new_order_count > old_order_count or
-                            force_update
-                        )
-
-                        if should_update:
-                            # UPDATE record
-                            cursor.execute("""
-                                UPDATE mt_business_summary
-                                SET city = ?, store_created_at = ?, operating_days = ?,
-                                    revenue = ?, discount_amount = ?, business_income = ?,
-                                    order_count = ?, diner_count = ?, table_count = ?,
-                                    per_capita_before_discount = ?, per_capita_after_discount = ?,
-                                    avg_order_before_discount = ?, avg_order_after_discount = ?,
-                                    table_opening_rate = ?, table_turnover_rate = ?, occupancy_rate = ?,
-                                    avg_dining_time = ?, composition_data = ?,
-                                    updated_at = CURRENT_TIMESTAMP
-                                WHERE id = ?
-                            """, (
-                                record.get('city', ''),
-                                record.get('store_created_at', ''),
-                                record.get('operating_days', 0),
-                                new_revenue,
-                                record.get('discount_amount', 0),
-                                record.get('business_income', 0),
-                                new_order_count,
-                                record.get('diner_count', 0),
-                                record.get('table_count', 0),
-                                record.get('per_capita_before_discount', 0),
-                                record.get('per_capita_after_discount', 0),
-                                record.get('avg_order_before_discount', 0),
-                                record.get('avg_order_after_discount', 0),
-                                record.get('table_opening_rate', ''),
-                                record.get('table_turnover_rate', 0),
-                                record.get('occupancy_rate', ''),
-                                record.get('avg_dining_time', 0),
-                                record.get('composition_data', '{}'),
-                                existing['id']
-                            ))
-                            stats["updated"] += 1
-                            logger.debug(
-                                f"UPDATE: {store_name}/{business_date} - "
-                                f"revenue: {old_revenue}->{new_revenue}"
-                            )
-                        else:
-                            stats["skipped"] += 1
-                            logger.debug(f"SKIP: {store_name}/{business_date} - existing data is higher")
-
-                conn.commit()
+        if missing:
+            logger.warning(f"Skipped {missing} records with missing store_name or business_date")
+            stats["skipped"] += missing
+
+        rows.sort(key=_BUSINESS_SUMMARY_CONFLICT_KEY)
+
+        if force_update:
+            sql = _UPSERT_BUSINESS_SUMMARY_IF_CHANGED_SQL
+        else:
+            sql = _UPSERT_BUSINESS_SUMMARY_IF_HIGHER_SQL
+
+        try:
+            with self.get_connection(write=True) as conn:
+                self._upsert_many(conn, "mt_business_summary", sql, rows, stats)
 
                 total = stats["inserted"] + stats["updated"] + stats["skipped"]
                 logger.info(
@@ -608,145 +852,22 @@ class DatabaseManager:
             logger.warning("No records to save")
             return stats
 
-        try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
+        # Required keys have no default, so a record missing one still raises KeyError
+        now = _utc_timestamp()
+        rows = [
+            _DISH_SALES_PARAMS({**_DISH_SALES_DEFAULTS, **record, 'updated_at': now})
+            for record in records
+        ]
+        rows.sort(key=_DISH_SALES_CONFLICT_KEY)
 
-                for record in records:
-                    store_name = record['store_name']
-                    business_date = record['business_date']
-                    dish_name = record['dish_name']
+        if force_update:
+            sql = _UPSERT_DISH_SALES_IF_CHANGED_SQL
+        else:
+            sql = _UPSERT_DISH_SALES_IF_HIGHER_SQL
 
-                    # Check if record exists
-                    cursor.execute("""
-                        SELECT id, sales_quantity, sales_amount
-                        FROM mt_dish_sales
-                        WHERE store_name = ? AND business_date = ? AND dish_name = ?
-                    """, (store_name, business_date, dish_name))
-
-                    existing = cursor.fetchone()
-
-                    if not existing:
-                        # INSERT new record
-                        cursor.execute("""
-                            INSERT INTO mt_dish_sales (
-                                store_name, org_code, business_date, dish_name,
-                                sales_quantity, sales_quantity_pct,
-                                price_before_discount, price_after_discount,
-                                sales_amount, sales_amount_pct,
-                                discount_amount, dish_discount_pct,
-                                dish_income, dish_income_pct,
-                                order_quantity, order_amount,
-                                return_quantity, return_amount,
-                                return_quantity_pct, return_amount_pct,
-                                return_rate, return_order_count,
-                                gift_quantity, gift_amount,
-                                gift_quantity_pct, gift_amount_pct,
-                                dish_order_count, related_order_amount,
-                                sales_per_thousand, order_rate, customer_click_rate
-                            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        """, (
-                            store_name,
-                            record.get('org_code'),
-                            business_date,
-                            dish_name,
-                            record.get('sales_quantity'),
-                            record.get('sales_quantity_pct'),
-                            record.get('price_before_discount'),
-                            record.get('price_after_discount'),
-                            record.get('sales_amount'),
-                            record.get('sales_amount_pct'),
-                            record.get('discount_amount'),
-                            record.get('dish_discount_pct'),
-                            record.get('dish_income'),
-                            record.get('dish_income_pct'),
-                            record.get('order_quantity'),
-                            record.get('order_amount'),
-                            record.get('return_quantity'),
-                            record.get('return_amount'),
-                            record.get('return_quantity_pct'),
-                            record.get('return_amount_pct'),
-                            record.get('return_rate'),
-                            record.get('return_order_count'),
-                            record.get('gift_quantity'),
-                            record.get('gift_amount'),
-                            record.get('gift_quantity_pct'),
-                            record.get('gift_amount_pct'),
-                            record.get('dish_order_count'),
-                            record.get('related_order_amount'),
-                            record.get('sales_per_thousand'),
-                            record.get('order_rate'),
-                            record.get('customer_click_rate')
-                        ))
-                        stats["inserted"] += 1
-                    else:
-                        # Check if update is needed
-                        old_quantity = existing['sales_quantity'] or 0
-                        old_amount = existing['sales_amount'] or 0
-                        new_quantity = record.get('sales_quantity') or 0
-                        new_amount = record.get('sales_amount') or 0
-
-                        should_update = (
-                            new_quantity > old_quantity or
-                            new_amount > old_amount or
-                            force_update
-                        )
-
-                        if should_update:
-                            # UPDATE record
-                            cursor.execute("""
-                                UPDATE mt_dish_sales
-                                SET org_code = ?, sales_quantity = ?, sales_quantity_pct = ?,
-                                    price_before_discount = ?, price_after_discount = ?,
-                                    sales_amount = ?, sales_amount_pct = ?,
-                                    discount_amount = ?, dish_discount_pct = ?,
-                                    dish_income = ?, dish_income_pct = ?,
-                                    order_quantity = ?, order_amount = ?,
-                                    return_quantity = ?, return_amount = ?,
-                                    return_quantity_pct = ?, return_amount_pct = ?,
-                                    return_rate = ?, return_order_count = ?,
-                                    gift_quantity = ?, gift_amount = ?,
-                                    gift_quantity_pct = ?, gift_amount_pct = ?,
-                                    dish_order_count = ?, related_order_amount = ?,
-                                    sales_per_thousand = ?, order_rate = ?, customer_click_rate = ?,
-                                    updated_at = CURRENT_TIMESTAMP
-                                WHERE id = ?
-                            """, (
-                                record.get('org_code'),
-                                new_quantity,
-                                record.get('sales_quantity_pct'),
-                                record.get('price_before_discount'),
-                                record.get('price_after_discount'),
-                                new_amount,
-                                record.get('sales_amount_pct'),
-                                record.get('discount_amount'),
-                                record.get('dish_discount_pct'),
-                                record.get('dish_income'),
-                                record.get('dish_income_pct'),
-                                record.get('order_quantity'),
-                                record.get('order_amount'),
-                                record.get('return_quantity'),
-                                record.get('return_amount'),
-                                record.get('return_quantity_pct'),
-                                record.get('return_amount_pct'),
-                                record.get('return_rate'),
-                                record.get('return_order_count'),
-                                record.get('gift_quantity'),
-                                record.get('gift_amount'),
-                                record.get('gift_quantity_pct'),
-                                record.get('gift_amount_pct'),
-                                record.get('dish_order_count'),
-                                record.get('related_order_amount'),
-                                record.get('sales_per_thousand'),
-                                record.get('order_rate'),
-                                record.get('customer_click_rate'),
-                                existing['id']
-                            ))
-                            stats["updated"] += 1
-                        else:
-                            stats["skipped"] += 1
-
-                conn.commit()
+        try:
+            with self.get_connection(write=True) as conn:
+                self._upsert_many(conn, "mt_dish_sales", sql, rows, stats)
 
                 total = stats["inserted"] + stats["updated"] + stats["skipped"]
                 logger.info(
@@ -777,53 +898,90 @@ class DatabaseManager:
             List of sales records
         """
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-
-                # Build query with filters
-                query = """
-                    SELECT
-                        s.id,
-                        s.org_code,
-                        st.store_name,
-                        s.date,
-                        s.package_name,
-                        s.unit_price,
-                        s.quantity_sold,
-                        s.total_sales,
-                        s.refund_quantity,
-                        s.refund_amount,
-                        s.created_at
-                    FROM mt_equity_package_sales s
-                    JOIN mt_stores st ON s.org_code = st.org_code
-                    WHERE 1=1
-                """
-                params = []
-
-                if org_code:
-                    query += " AND s.org_code = ?"
-                    params.append(org_code)
-
-                if start_date:
-                    query += " AND s.date >= ?"
-                    params.append(start_date)
-
-                if end_date:
-                    query += " AND s.date <= ?"
-                    params.append(end_date)
-
-                query += " ORDER BY s.date DESC, st.store_name, s.package_name"
-
-                cursor.execute(query, params)
-                results = [dict(row) for row in cursor.fetchall()]
-
-                logger.info(f"Retrieved {len(results)} equity sales records")
-                return results
+            results = list(self.get_equity_sales_iter(org_code, start_date, end_date))
+            logger.info(f"Retrieved {len(results)} equity sales records")
+            return results
 
         except sqlite3.Error as e:
             logger.error(f"Error retrieving equity sales: {e}")
             return []
 
+    def get_equity_sales_iter(
+        self,
+        org_code: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream equity package sales one record at a time.
+
+        Same filters and ordering as get_equity_sales, but rows are fetched
+        from the cursor and converted to dicts as they are consumed, so a
+        large result set is never held in memory as a list.
+
+        The read stays open on this thread's reader connection until the
+        iterator is exhausted or closed. Callers that stop early must call
+        close() on it (or let it be garbage collected) so the WAL snapshot
+        does not block checkpoints.
+
+        Args:
+            org_code: Filter by organization code
+            start_date: Filter by start date (inclusive)
+            end_date: Filter by end date (inclusive)
+
+        Yields:
+            Sales record dictionaries
+
+        Raises:
+            sqlite3.Error: If the query fails
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row  # Column access by name
+
+            # Build query with filters
+            query = """
+                SELECT
+                    s.id,
+                    s.org_code,
+                    st.store_name,
+                    s.date,
+                    s.package_name,
+                    s.unit_price,
+                    s.quantity_sold,
+                    s.total_sales,
+                    s.refund_quantity,
+                    s.refund_amount,
+                    s.created_at
+                FROM mt_equity_package_sales s
+                JOIN mt_stores st ON s.org_code = st.org_code
+                WHERE 1=1
+            """
+            params = []
+
+            if org_code:
+                query += " AND s.org_code = ?"
+                params.append(org_code)
+
+            if start_date:
+                query += " AND s.date >= ?"
+                params.append(start_date)
+
+            if end_date:
+                query += " AND s.date <= ?"
+                params.append(end_date)
+
+            query += " ORDER BY s.date DESC, st.store_name, s.package_name"
+
+            try:
+                cursor.execute(query, params)
+                for row in cursor:
+                    yield dict(row)
+            finally:
+                # Ends the read statement (and its WAL snapshot) even if the
+                # caller stops early, so checkpoints are not held back
+                cursor.close()
+
     def data_exists(
         self,
         org_code: str,
@@ -844,20 +1002,21 @@ class DatabaseManager:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
+                # Stop at the first match instead of counting
                 cursor.execute("""
-                    SELECT COUNT(*) as count
+                    SELECT 1
                     FROM mt_equity_package_sales
                     WHERE org_code = ?
                         AND date = ?
                         AND package_name = ?
+                    LIMIT 1
                 """, (org_code, date, package_name))
 
-                row = cursor.fetchone()
-                exists = row['count'] > 0
+                exists = cursor.fetchone() is not None
 
                 if exists:
                     logger.debug(
-                        f"Data exists for {org_code} / {package_name} on {date}"
+                        "Data exists for %s / %s on %s", org_code, package_name, date
                     )
 
                 return exists
@@ -1,5 +1,13 @@
 """
 Supabase Database Manager for Meituan Crawler
+v1.9 - save_equity_package_sales inserts new rows in batches of BATCH_SIZE
+     - Previous: 1 POST per new record
+     - Now: new rows queued during the loop, then 1 upsert per batch with retry
+     - A batch that still fails is written row by row (per-record error isolation)
+v1.8 - save_equity_package_sales prefetches existing rows for the batch
+     - Previous: 1 GET per record to find the existing row
+     - Now: 1 paged query per batch; per-record GET only as fallback
+v1.7 - Per-record debug logs use lazy %-style arguments
 v1.6 - Fixed timeout issues with retry logic and smaller batches
      - Reduced batch size from 100 to 50 for reliability
      - Added exponential backoff retry (3 attempts)
@@ -33,7 +41,7 @@ Usage:
 import os
 import logging
 import time
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 
 from supabase import create_client, Client
@@ -70,6 +78,7 @@ class SupabaseManager:
 
     # Batch and retry configuration
     BATCH_SIZE = 50  # Reduced from 100 for reliability
+    PREFETCH_PAGE_SIZE = 1000  # Rows requested per prefetch page (server may cap lower)
     MAX_RETRIES = 3
     INITIAL_RETRY_DELAY = 2  # seconds
     HTTP_TIMEOUT = 30  # seconds
@@ -161,12 +170,12 @@ class SupabaseManager:
                 # Cache by org_code if available
                 if org_code:
                     self._restaurant_cache[org_code] = restaurant_id
-                    logger.debug(f"Cached org_code: {org_code} -> {restaurant_id[:8]}...")
+                    logger.debug("Cached org_code: %s -> %.8s...", org_code, restaurant_id)
 
                 # Cache by restaurant_name (for business_summary lookups)
                 if restaurant_name:
                     self._restaurant_name_cache[restaurant_name] = restaurant_id
-                    logger.debug(f"Cached name: {restaurant_name} -> {restaurant_id[:8]}...")
+                    logger.debug("Cached name: %s -> %.8s...", restaurant_name, restaurant_id)
 
             self._cache_loaded = True
             logger.info(
@@ -236,10 +245,15 @@ class SupabaseManager:
         continue to be processed normally.
 
         Duplicate Handling Logic:
-        - If record doesn't exist: INSERT new record
+        - If record doesn't exist: queue it for INSERT
         - If record exists AND (new quantity > old OR new sales > old): UPDATE
         - If record exists AND new values are NOT higher: SKIP
 
+        Queued rows are written after the loop with one upsert per BATCH_SIZE
+        rows (on_conflict='restaurant_id,date,package_name'), retried with
+        backoff. If a batch still fails, its rows are written one by one, so
+        only the rows that fail themselves are counted as failed.
+
         Args:
             records: List of record dictionaries with keys:
                 - org_code: Meituan organization code
@@ -279,9 +293,18 @@ class SupabaseManager:
         # Pre-load restaurant mappings
         self._load_restaurant_cache()
 
+        # Pre-load existing rows for the whole batch (1 paged query instead of
+        # 1 GET per record); keys missing from the map fall back to a GET
+        existing_map = self._get_existing_records(records)
+
         # Track unique unknown stores to avoid duplicate warnings
         seen_unknown = set()
 
+        # New rows are queued here and inserted in batches after the loop
+        pending: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        # Updates folded into a queued row, per key (undone if its batch fails)
+        pending_updates: Dict[Tuple[str, str, str], int] = {}
+
         for record in records:
             try:
                 org_code = record['org_code']
@@ -311,15 +334,24 @@ class SupabaseManager:
                     continue  # SKIP this record, continue with others
 
                 # Check if record exists and get current values
-                existing = self._get_existing_record(restaurant_id, date, package_name)
+                key = (restaurant_id, date, package_name)
+                if key in existing_map:
+                    existing = existing_map[key]
+                else:
+                    existing = self._get_existing_record(restaurant_id, date, package_name)
 
                 if existing is None:
-                    # No existing record - INSERT new
-                    self._insert_record(restaurant_id, record)
+                    # No existing record - queue for the batched INSERT
+                    pending[key] = self._equity_insert_row(restaurant_id, record)
                     stats["inserted"] += 1
+                    existing_map[key] = {
+                        'id': None,  # Not written yet
+                        'quantity_sold': new_quantity,
+                        'total_sales': new_sales
+                    }
                     logger.debug(
-                        f"INSERT: {org_code}/{date}/{package_name} - "
-                        f"qty={new_quantity}, sales={new_sales}"
+                        "INSERT: %s/%s/%s - qty=%s, sales=%s",
+                        org_code, date, package_name, new_quantity, new_sales
                     )
 
                 else:
@@ -329,19 +361,29 @@ class SupabaseManager:
 
                     if new_quantity > old_quantity or new_sales > old_sales:
                         # New values are higher - UPDATE
-                        self._update_record(existing['id'], record)
+                        if existing['id'] is None:
+                            # Still queued: replace the pending INSERT row
+                            pending[key] = self._equity_insert_row(restaurant_id, record)
+                            pending_updates[key] = pending_updates.get(key, 0) + 1
+                        else:
+                            self._update_record(existing['id'], record)
                         stats["updated"] += 1
+                        existing_map[key] = {
+                            'id': existing['id'],
+                            'quantity_sold': new_quantity,
+                            'total_sales': new_sales
+                        }
                         logger.debug(
-                            f"UPDATE: {org_code}/{date}/{package_name} - "
-                            f"qty: {old_quantity}->{new_quantity}, "
-                            f"sales: {old_sales}->{new_sales}"
+                            "UPDATE: %s/%s/%s - qty: %s->%s, sales: %s->%s",
+                            org_code, date, package_name,
+                            old_quantity, new_quantity, old_sales, new_sales
                         )
                     else:
                         # New values are NOT higher - SKIP
                         stats["skipped"] += 1
                         logger.debug(
-                            f"SKIP: {org_code}/{date}/{package_name} - "
-                            f"existing qty={old_quantity} >= new={new_quantity}"
+                            "SKIP: %s/%s/%s - existing qty=%s >= new=%s",
+                            org_code, date, package_name, old_quantity, new_quantity
                         )
 
             except Exception as e:
@@ -354,6 +396,47 @@ class SupabaseManager:
                 stats["failed"] += 1
                 continue  # Continue processing other records
 
+        # Batch upsert new rows with retry logic (1 HTTP request per BATCH_SIZE rows).
+        # Upserting on the unique key keeps a retry idempotent when a timed-out
+        # request had already been committed.
+        if pending:
+            new_keys = list(pending)
+            total_batches = (len(new_keys) + self.BATCH_SIZE - 1) // self.BATCH_SIZE
+            logger.info(f"Batch inserting {len(new_keys)} new records in {total_batches} batch(es) (batch_size={self.BATCH_SIZE})...")
+
+            for i in range(0, len(new_keys), self.BATCH_SIZE):
+                batch_keys = new_keys[i:i + self.BATCH_SIZE]
+                batch = [pending[key] for key in batch_keys]
+                batch_num = (i // self.BATCH_SIZE) + 1
+
+                # Define the upsert operation for retry wrapper
+                def do_upsert():
+                    self._client.table('mt_equity_package_sales').upsert(
+                        batch,
+                        on_conflict='restaurant_id,date,package_name'
+                    ).execute()
+
+                # Execute with retry
+                if self._retry_with_backoff(do_upsert, batch_num, total_batches):
+                    continue
+
+                # Error isolation: write the failed batch row by row so one bad
+                # row does not fail the rest
+                logger.warning(f"Batch {batch_num}/{total_batches} failed, writing its {len(batch)} records one by one")
+                for key in batch_keys:
+                    try:
+                        self._client.table('mt_equity_package_sales').upsert(
+                            pending[key],
+                            on_conflict='restaurant_id,date,package_name'
+                        ).execute()
+                    except Exception as e:
+                        logger.error(f"插入记录失败 {key[1]}/{key[2]}: {e}")
+                        # The queued row also carried any updates folded into it
+                        folded = pending_updates.get(key, 0)
+                        stats["inserted"] -= 1
+                        stats["updated"] -= folded
+                        stats["failed"] += 1 + folded
+
         # Log summary
         total = sum([stats["inserted"], stats["updated"], stats["skipped"], stats["failed"]])
         logger.info(
@@ -370,6 +453,75 @@ class SupabaseManager:
 
         return stats
 
+    def _get_existing_records(
+        self,
+        records: List[Dict[str, Any]]
+    ) -> Dict[Tuple[str, str, str], Optional[Dict[str, Any]]]:
+        """
+        Load the existing rows for a batch of equity records in one paged query.
+
+        The query filters on the batch's restaurant_ids, dates and package
+        names, and pages by the number of rows actually returned until a page
+        comes back empty.
+
+        Args:
+            records: Equity records about to be saved
+
+        Returns:
+            Map of (restaurant_id, date, package_name) to the existing row
+            (id, quantity_sold, total_sales), or None if the row does not exist.
+            Empty if the query fails, so every record falls back to
+            _get_existing_record().
+        """
+        keys = set()
+        for record in records:
+            restaurant_id = self._restaurant_cache.get(record.get('org_code'))
+            if restaurant_id and record.get('date') and record.get('package_name'):
+                keys.add((restaurant_id, record['date'], record['package_name']))
+
+        if not keys:
+            return {}
+
+        existing_map: Dict[Tuple[str, str, str], Optional[Dict[str, Any]]] = dict.fromkeys(keys)
+        restaurant_ids = sorted({key[0] for key in keys})
+        dates = sorted({key[1] for key in keys})
+        package_names = sorted({key[2] for key in keys})
+
+        try:
+            # Page until an empty page: the server's max-rows cap may be lower
+            # than PREFETCH_PAGE_SIZE, so a short page does not mean the end
+            start = 0
+            while True:
+                result = self._client.table('mt_equity_package_sales').select(
+                    'id, restaurant_id, date, package_name, quantity_sold, total_sales'
+                ).in_(
+                    'restaurant_id', restaurant_ids
+                ).in_(
+                    'date', dates
+                ).in_(
+                    'package_name', package_names
+                ).order('id').range(start, start + self.PREFETCH_PAGE_SIZE - 1).execute()
+
+                if not result.data:
+                    break
+
+                for row in result.data:
+                    key = (row['restaurant_id'], row['date'], row['package_name'])
+                    if key in existing_map:
+                        existing_map[key] = row
+
+                start += len(result.data)
+
+        except Exception as e:
+            logger.warning(f"批量查询现有记录失败，改为逐条查询: {e}")
+            return {}
+
+        logger.debug(
+            "Prefetched %d existing of %d equity keys",
+            sum(row is not None for row in existing_map.values()), len(keys)
+        )
+        return existing_map
+
     def _get_existing_record(
         self,
         restaurant_id: str,
@@ -406,15 +558,18 @@ class SupabaseManager:
             logger.error(f"查询现有记录失败: {e}")
             return None
 
-    def _insert_record(self, restaurant_id: str, record: Dict[str, Any]) -> None:
+    def _equity_insert_row(self, restaurant_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Insert a new equity package sales record.
+        Build the mt_equity_package_sales row for a new record.
 
         Args:
             restaurant_id: Restaurant UUID
             record: Record data
+
+        Returns:
+            Row dict ready for insert
         """
-        data = {
+        return {
             'restaurant_id': restaurant_id,
             'date': record['date'],
             'package_name': record['package_name'],
@@ -425,8 +580,6 @@ class SupabaseManager:
             'refund_amount': float(record.get('refund_amount', 0.0)),
         }
 
-        self._client.table('mt_equity_package_sales').insert(data).execute()
-
     def _update_record(self, record_id: str, record: Dict[str, Any]) -> None:
         """
         Update an existing equity package sales record.
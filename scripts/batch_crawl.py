@@ -0,0 +1,613 @@
+#!/usr/bin/env python3
+"""
+Batch Crawler - Runs src/main.py once per date over a date range
+v2.6 - Cancelling the batch (Ctrl+C) kills running children's process groups
+v2.5 - --in-process drops an endpoint's CDP session after any failed or timed-out run
+v2.4 - Manifest records every finished date (status, exit code, attempts, timings)
+v2.3 - Added --max-rps: token bucket capping how fast crawls start across endpoints
+v2.2 - Spawn children from a pre-resolved interpreter and absolute src/main.py path
+v2.1 - Added --chunk-size: several dates per src/main.py run via --dates
+v2.0 - Added --shard i/n: split one backfill across several machines
+v1.9 - Timeouts kill the child's whole process group (Playwright driver included)
+v1.8 - One status line per attempt and per finished date (no banners), with ETA
+v1.7 - Added --retries: failed dates are retried with exponential backoff
+v1.6 - Each endpoint crawls one contiguous block of dates instead of leasing per date
+v1.5 - --in-process keeps one CDP connection per endpoint for the whole batch
+v1.4 - Child output goes to logs/batch/<date>.log; failures print the log tail
+v1.3 - Added --resume: skip dates recorded as done in data/batch_manifest.json
+v1.2 - Added --in-process mode: one interpreter for all dates (no per-date startup)
+v1.1 - Supervise child processes with asyncio instead of a thread pool
+v1.0 - Parallel fan-out across a pool of Chrome CDP endpoints
+
+Each date is crawled by its own `src/main.py` process. The date range is split
+into contiguous blocks, one per CDP endpoint, and each endpoint works through
+its block in date order; blocks run concurrently, dates within a block never
+do. Every endpoint must be a separate Chrome instance (own port, own profile,
+already logged in), because two crawlers driving the same page would overwrite
+each other's filters. With the default single endpoint the batch runs serially.
+
+With --in-process, dates are crawled by awaiting src.main.run() directly, so
+Python, Playwright and the crawler modules are imported once per batch instead
+of once per date, and each endpoint's CDP connection is opened once and reused
+by every date leased to it. Subprocess mode (the default) isolates each date: a crash or
+hang in one crawl cannot take down the rest of the batch.
+
+With --chunk-size N, each run crawls N consecutive dates of its block
+(src/main.py --dates), paying interpreter start-up and CDP connect once per
+chunk. A failed chunk counts as failed for all of its dates and is retried
+whole.
+
+In subprocess mode each child's stdout/stderr is written to
+logs/batch/<date>.log (<first>..<last>.log for chunks) rather than the terminal, so parallel dates stay
+readable; when a date fails the last lines of its log are printed.
+
+A date that fails or times out is retried (--retries, default 2) after an
+exponential backoff with jitter (5s, 20s, ... capped at 60s), so a transient
+CDP hang does not need a manual re-run.
+
+Crawl starts (first attempts and retries, across all endpoints) are paced by a
+token bucket, --max-rps (default 0.5, i.e. one start every 2s like
+backfill_missing_dates.sh), so a wide --cdp-pool does not hit Meituan with a
+burst of report queries at once.
+
+Every finished date, successful or not, is recorded in a manifest with its
+status, exit code, attempts and start/finish times (written atomically after
+each date, so it survives kill -9). With --resume, dates the manifest records
+as done for the requested reports are skipped, so restarting a failed backfill
+only redoes what is missing.
+
+With --shard i/n the range is split into n contiguous slices and only slice i
+is crawled, so a long backfill can be spread over n machines (each with its
+own logged-in Chrome) by running the same command with a different i.
+
+Usage:
+    # Serial backfill against the default Chrome (localhost:9222)
+    python scripts/batch_crawl.py --start 2025-12-01 --end 2025-12-31
+
+    # Restart an interrupted backfill, skipping dates that already succeeded
+    python scripts/batch_crawl.py --start 2025-12-01 --end 2025-12-31 --resume
+
+    # 3-way parallel backfill across three logged-in Chrome instances
+    python scripts/batch_crawl.py --start 2025-12-01 --end 2025-12-31 \\
+        --cdp-pool http://localhost:9222,http://localhost:9223,http://localhost:9224
+
+    # One src/main.py run (one CDP connect) per week of dates
+    python scripts/batch_crawl.py --start 2025-12-01 --end 2025-12-31 --chunk-size 7
+
+    # Two-machine backfill of 2025: run 1/2 on one machine and 2/2 on the other
+    python scripts/batch_crawl.py --start 2025-01-01 --end 2025-12-31 --shard 1/2
+"""
+
+import os
+import sys
+import json
+import argparse
+import time
+import random
+import signal
+import asyncio
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config import CDP_URL, LOG_DIR
+
+if TYPE_CHECKING:
+    # Annotations only: Playwright is imported lazily, and only by --in-process
+    from src.browser import CDPSession
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+SYS_EXE = sys.executable
+MAIN_PY = str(PROJECT_DIR / 'src' / 'main.py')
+DATE_TIMEOUT = 600  # seconds per date (a chunk gets this per date it holds)
+MANIFEST_NAME = "batch_manifest.json"
+BATCH_LOG_DIR = PROJECT_DIR / LOG_DIR / "batch"
+READ_CHUNK = 64 * 1024  # bytes per pipe read
+TAIL_BYTES = 4 * 1024  # child output kept in memory for failure reports
+KILL_GRACE = 5  # seconds between SIGTERM and SIGKILL for a timed-out child
+RETRY_BASE_DELAY = 5  # seconds before the first retry, x4 per further retry
+RETRY_MAX_DELAY = 60
+
+
+def daterange(start: str, end: str) -> List[str]:
+    """Return every date from start to end (inclusive) as YYYY-MM-DD."""
+    first = datetime.strptime(start, '%Y-%m-%d').date()
+    last = datetime.strptime(end, '%Y-%m-%d').date()
+    return [(first + timedelta(days=i)).isoformat() for i in range((last - first).days + 1)]
+
+
+class TokenBucket:
+    """Async token bucket: take() waits until a token is available, refilling at rps."""
+
+    def __init__(self, rps: float):
+        self.rps = rps
+        self.capacity = max(1.0, rps)
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def take(self) -> None:
+        # Holding the lock while sleeping keeps waiters first-come, first-served
+        async with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rps)
+            self.last = now
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rps)
+                self.tokens = 1
+                self.last = time.monotonic()
+            self.tokens -= 1
+
+
+def split_blocks(dates: List[str], n: int) -> List[List[str]]:
+    """Split dates into n contiguous blocks whose sizes differ by at most one."""
+    size, extra = divmod(len(dates), n)
+    blocks = []
+    start = 0
+    for i in range(n):
+        end = start + size + (1 if i < extra else 0)
+        blocks.append(dates[start:end])
+        start = end
+    return blocks
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """Parse an 'i/n' shard spec (1 <= i <= n) for argparse."""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid shard '{value}', expected i/n")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"invalid shard '{value}', need 1 <= i <= n")
+    return index, count
+
+
+def retry_delay(attempt: int) -> float:
+    """Backoff before retry number `attempt` (1-based), with up to 1s of jitter."""
+    return min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 4 ** (attempt - 1)) + random.random()
+
+
+def progress(done: int, total: int, failed: int, started: float) -> str:
+    """Format '[done/total pct%] N failed | elapsed, eta' for the per-date status line."""
+    elapsed = time.monotonic() - started
+    eta = elapsed / done * (total - done)
+    failures = f" {failed} failed |" if failed else ""
+    return (f"[{done}/{total} {done * 100 // total}%]{failures} "
+            f"elapsed {elapsed / 60:.1f}m, eta {eta / 60:.1f}m")
+
+
+def load_manifest(path: Path) -> Dict[str, Dict[str, object]]:
+    """Load the date -> completion record manifest (empty if missing)."""
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding='utf-8'))
+
+
+def save_manifest(path: Path, manifest: Dict[str, Dict[str, object]]) -> None:
+    """Write the manifest atomically so a killed batch never leaves it half-written."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True), encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def _now() -> str:
+    """Local timestamp for manifest entries."""
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def _already_done(manifest: Dict[str, Dict[str, object]], date: str, reports: List[str]) -> bool:
+    """True if a previous run crawled every requested report for this date."""
+    entry = manifest.get(date)
+    # Entries written before v2.4 have no status and were only written on success
+    if not entry or entry.get('status', 'done') != 'done':
+        return False
+    done_reports = set(entry.get('reports', []))
+    return 'all' in done_reports or set(reports) <= done_reports
+
+
+def _main_args(chunk: List[str], cdp: str, args: argparse.Namespace) -> List[str]:
+    """Build the src/main.py argument list for one chunk of dates."""
+    if len(chunk) == 1:
+        date_args = ['--date', chunk[0]]
+    else:
+        date_args = ['--dates', ','.join(chunk)]
+    argv = ['--report', *args.report, *date_args, '--cdp', cdp]
+    if args.no_supabase:
+        argv.append('--no-supabase')
+    return argv
+
+
+async def _pump(stream: asyncio.StreamReader, log_path: Path, tail: bytearray) -> None:
+    """Copy a child's output into its log file, keeping the last TAIL_BYTES in tail."""
+    with open(log_path, 'ab') as f:
+        while chunk := await stream.read(READ_CHUNK):
+            f.write(chunk)
+            tail += chunk
+            del tail[:-TAIL_BYTES]
+
+
+async def _kill_group(proc: asyncio.subprocess.Process) -> None:
+    """
+    Terminate a timed-out child and everything it spawned.
+
+    The child leads its own process group (start_new_session), so the
+    Playwright driver dies with it instead of leaking into later dates. Chrome
+    itself is launched in a separate session by cdp_launcher and survives.
+    """
+    if os.name != 'posix':
+        proc.kill()
+        await proc.wait()
+        return
+
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        try:
+            await asyncio.wait_for(proc.wait(), timeout=KILL_GRACE)
+        except asyncio.TimeoutError:
+            pass
+        # Stragglers in the group may outlive the leader
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    await proc.wait()
+
+
+async def _crawl_subprocess(argv: List[str], log_path: Path, timeout: float) -> Tuple[Optional[int], str]:
+    """
+    Run src/main.py in a child process with its output sent to log_path.
+
+    Returns:
+        (returncode, tail) - returncode is None on timeout, tail is the end of the output
+    """
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    proc = await asyncio.create_subprocess_exec(
+        SYS_EXE, MAIN_PY, *argv,
+        cwd=PROJECT_DIR,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        start_new_session=(os.name == 'posix')
+    )
+    tail = bytearray()
+    pump = asyncio.create_task(_pump(proc.stdout, log_path, tail))
+    try:
+        returncode = await asyncio.wait_for(proc.wait(), timeout=timeout)
+        await pump
+    except asyncio.TimeoutError:
+        await _kill_group(proc)
+        returncode = None
+        # Anything that escaped the group may still hold the pipe open
+        pump.cancel()
+    except BaseException:
+        # Cancelled (e.g. Ctrl+C): the child's own session does not see the
+        # terminal's SIGINT, so stop its group before unwinding
+        if proc.returncode is None:
+            await _kill_group(proc)
+        pump.cancel()
+        raise
+    return returncode, tail.decode('utf-8', errors='replace')
+
+
+async def _get_session(sessions: Dict[str, "CDPSession"], cdp: str) -> "CDPSession":
+    """Return the open CDP session for an endpoint, connecting on first use."""
+    session = sessions.get(cdp)
+    if session is None:
+        from src.browser import CDPSession
+
+        session = CDPSession(cdp)
+        await session.connect()
+        sessions[cdp] = session
+    return session
+
+
+async def _close_sessions(sessions: Dict[str, "CDPSession"]) -> None:
+    """Close every CDP session opened by --in-process."""
+    for session in sessions.values():
+        await session.close()
+    sessions.clear()
+
+
+async def _crawl_in_process(
+    argv: List[str],
+    cdp: str,
+    sessions: Dict[str, "CDPSession"],
+    timeout: float
+) -> Optional[int]:
+    """Run src.main.run() in this interpreter on the endpoint's shared session. Returns None on timeout."""
+    from src.main import run, parse_args
+
+    try:
+        session = await _get_session(sessions, cdp)
+        returncode = await asyncio.wait_for(run(parse_args(argv), session=session), timeout=timeout)
+    except asyncio.TimeoutError:
+        returncode = None
+    except SystemExit as e:
+        # argparse errors (and sys.exit in the crawl) fail this chunk only,
+        # with the exit status a subprocess would have reported
+        print(f"✗ Crawl exited: {e.code}")
+        returncode = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception as e:
+        print(f"✗ Crawl raised: {e}")
+        returncode = 1
+
+    if returncode != 0:
+        # run() catches its own errors and returns 1, so a dead CDP session
+        # looks like any other failure: reconnect on the next attempt rather
+        # than reuse a possibly broken session
+        session = sessions.pop(cdp, None)
+        if session is not None:
+            await session.close()
+    return returncode
+
+
+async def run_chunk(
+    chunk: List[str],
+    cdp: str,
+    args: argparse.Namespace,
+    sessions: Dict[str, "CDPSession"],
+    bucket: TokenBucket
+) -> Tuple[Optional[int], Optional[str], int, str]:
+    """
+    Crawl a chunk of consecutive dates in one run on the given CDP endpoint,
+    retrying failures.
+
+    Returns:
+        (returncode, error, attempts, started_at) - returncode is None on timeout,
+        started_at is when the first attempt began
+    """
+    argv = _main_args(chunk, cdp, args)
+    label = chunk[0] if len(chunk) == 1 else f"{chunk[0]}..{chunk[-1]}"
+    timeout = DATE_TIMEOUT * len(chunk)
+    attempts = args.retries + 1
+
+    started_at = None
+    for attempt in range(1, attempts + 1):
+        await bucket.take()
+        started_at = started_at or _now()
+        tail = ""
+        if args.in_process:
+            print(f"→ {label} on {cdp} (attempt {attempt}/{attempts})")
+            returncode = await _crawl_in_process(argv, cdp, sessions, timeout)
+        else:
+            log_path = BATCH_LOG_DIR / f"{label}.log"
+            print(f"→ {label} on {cdp} (attempt {attempt}/{attempts}) > {log_path}")
+            returncode, tail = await _crawl_subprocess(argv, log_path, timeout)
+
+        if returncode is None:
+            error = f"timeout after {timeout}s"
+        else:
+            error = None if returncode == 0 else f"exit code {returncode}"
+
+        if error is None:
+            break
+
+        if tail:
+            print(f"--- last output for {label} ---")
+            print("\n".join(tail.splitlines()[-20:]))
+        if attempt < attempts:
+            delay = retry_delay(attempt)
+            print(f"✗ {label} failed ({error}), retrying in {delay:.0f}s")
+            await asyncio.sleep(delay)
+
+    return returncode, error, attempt, started_at
+
+
+async def run_block(
+    block: List[str],
+    cdp: str,
+    args: argparse.Namespace,
+    sessions: Dict[str, "CDPSession"],
+    bucket: TokenBucket,
+    results: "asyncio.Queue[Tuple[str, Optional[int], Optional[str], int, str]]"
+) -> None:
+    """
+    Crawl a contiguous block of dates chunk by chunk on a single endpoint.
+
+    Each date's (date, returncode, error, attempts, started_at) is put on
+    results as soon as its chunk finishes, so progress and the manifest update
+    while the block runs.
+    """
+    size = args.chunk_size
+    for i in range(0, len(block), size):
+        chunk = block[i:i + size]
+        try:
+            returncode, error, attempts, started_at = await run_chunk(chunk, cdp, args, sessions, bucket)
+        except Exception as e:
+            returncode, error, attempts, started_at = 1, f"crashed: {e}", 1, _now()
+        for date in chunk:
+            results.put_nowait((date, returncode, error, attempts, started_at))
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description='Run the crawler for every date in a range',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+
+    parser.add_argument('--start', required=True, help='Start date YYYY-MM-DD')
+    parser.add_argument('--end', default=None, help='End date YYYY-MM-DD (default: same as start)')
+
+    parser.add_argument(
+        '--report',
+        nargs='+',
+        default=['all'],
+        help='Report(s) passed through to src/main.py (default: all)'
+    )
+
+    parser.add_argument(
+        '--cdp-pool',
+        default=CDP_URL,
+        help=f'Comma-separated CDP endpoints, one per Chrome instance (default: {CDP_URL})'
+    )
+
+    parser.add_argument(
+        '--parallel',
+        type=int,
+        default=None,
+        help='Max dates crawled at once (default: min(8, dates, CDP endpoints))'
+    )
+
+    parser.add_argument(
+        '--shard',
+        type=parse_shard,
+        default=None,
+        metavar='I/N',
+        help='Crawl only the I-th of N contiguous slices of the range (multi-machine backfill)'
+    )
+
+    parser.add_argument(
+        '--chunk-size',
+        type=int,
+        default=1,
+        help='Dates crawled per src/main.py run (default: 1)'
+    )
+
+    parser.add_argument(
+        '--max-rps',
+        type=float,
+        default=0.5,
+        help='Max crawl starts per second across all endpoints (default: 0.5)'
+    )
+
+    parser.add_argument(
+        '--retries',
+        type=int,
+        default=2,
+        help='Times to retry a failed or timed-out date (default: 2)'
+    )
+
+    parser.add_argument(
+        '--no-supabase',
+        action='store_true',
+        help='Skip Supabase upload'
+    )
+
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Skip dates the manifest already records as done'
+    )
+
+    parser.add_argument(
+        '--output-dir',
+        default=str(PROJECT_DIR / 'data'),
+        help=f'Directory for {MANIFEST_NAME} (default: data/)'
+    )
+
+    parser.add_argument(
+        '--in-process',
+        action='store_true',
+        help='Crawl all dates in this interpreter instead of one src/main.py process per date'
+    )
+
+    args = parser.parse_args()
+
+    dates = daterange(args.start, args.end or args.start)
+    if not dates:
+        print(f"✗ Empty date range: {args.start} to {args.end}")
+        sys.exit(1)
+
+    if args.parallel is not None and args.parallel < 1:
+        print(f"✗ --parallel must be at least 1, got {args.parallel}")
+        sys.exit(1)
+
+    if args.chunk_size < 1:
+        print(f"✗ --chunk-size must be at least 1, got {args.chunk_size}")
+        sys.exit(1)
+
+    if args.max_rps <= 0:
+        print(f"✗ --max-rps must be positive, got {args.max_rps}")
+        sys.exit(1)
+
+    if args.retries < 0:
+        print(f"✗ --retries must be 0 or more, got {args.retries}")
+        sys.exit(1)
+
+    if args.shard:
+        index, count = args.shard
+        dates = split_blocks(dates, count)[index - 1]
+        if not dates:
+            print(f"✓ Shard {index}/{count} is empty - nothing to do")
+            return
+        print(f"Shard {index}/{count}: {dates[0]} to {dates[-1]}")
+
+    manifest_path = Path(args.output_dir) / MANIFEST_NAME
+    manifest = load_manifest(manifest_path)
+
+    if args.resume:
+        pending = [d for d in dates if not _already_done(manifest, d, args.report)]
+        if len(pending) < len(dates):
+            print(f"Resume: skipping {len(dates) - len(pending)} dates already done")
+        if not pending:
+            print("✓ Nothing to do - every date is already done")
+            return
+        dates = pending
+
+    endpoints = [url.strip() for url in args.cdp_pool.split(',') if url.strip()]
+
+    # One block per worker and one worker per endpoint
+    parallel = min(args.parallel or 8, len(dates), len(endpoints))
+    blocks = split_blocks(dates, parallel)
+
+    print(f"Starting batch crawl for {len(dates)} dates ({dates[0]} to {dates[-1]})")
+    print(f"Parallel: {parallel} | CDP endpoints: {', '.join(endpoints)}")
+    print("")
+
+    if args.in_process:
+        # src.main resolves logs/ and database/ relative to the working directory
+        os.chdir(PROJECT_DIR)
+
+    sessions = {}  # --in-process only: endpoint -> connected CDPSession
+    bucket = TokenBucket(args.max_rps)
+    results = asyncio.Queue()
+    workers = [
+        asyncio.create_task(run_block(block, cdp, args, sessions, bucket, results))
+        for block, cdp in zip(blocks, endpoints)
+    ]
+
+    failed = []
+    started = time.monotonic()
+    try:
+        for done in range(1, len(dates) + 1):
+            date, returncode, error, attempts, started_at = await results.get()
+            # Only this loop writes the manifest, so saves never interleave
+            manifest[date] = {
+                "status": "done" if error is None else "failed",
+                "returncode": returncode,
+                "error": error,
+                "attempts": attempts,
+                "reports": sorted(args.report),
+                "started_at": started_at,
+                "finished_at": _now()
+            }
+            save_manifest(manifest_path, manifest)
+            if error is None:
+                retried = f" after {attempts} attempts" if attempts > 1 else ""
+                status = f"✓ {date} done{retried}"
+            else:
+                failed.append((date, attempts, returncode))
+                status = f"✗ {date} failed after {attempts} attempts: {error}"
+            print(f"{status} {progress(done, len(dates), len(failed), started)}")
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        await _close_sessions(sessions)
+
+    print("")
+    print(f"Batch complete: {len(dates) - len(failed)}/{len(dates)} dates succeeded")
+    if failed:
+        print("Failed dates:")
+        for date, attempts, returncode in sorted(failed):
+            rc = "timeout" if returncode is None else f"exit code {returncode}"
+            print(f"  {date}: {rc} ({attempts} attempts)")
+        print("Re-run with --resume to retry only the failed dates")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """
 Database Sync Tool - Bidirectional sync between local SQLite and Supabase
+v1.1 - Equity push streams local records instead of loading them all first
 v1.0 - Supports equity_package_sales and business_summary tables
 
 Usage:
@@ -227,21 +228,20 @@ class DatabaseSync:
         logger.info("\n--- Pushing equity_package_sales to Supabase ---")
 
         try:
-            # Get all local records
-            local_records = self.db.get_equity_sales()
-            logger.info(f"Found {len(local_records)} records in local SQLite")
-
             # Get cloud record keys for comparison
             cloud_keys = self._get_cloud_equity_keys()
             logger.info(f"Found {len(cloud_keys)} records in Supabase")
 
-            # Find records missing in cloud
+            # Stream local records, keeping only those missing in cloud
+            local_count = 0
             records_to_push = []
-            for record in local_records:
+            for record in self.db.get_equity_sales_iter():
+                local_count += 1
                 key = (record['org_code'], record['date'], record['package_name'])
                 if key not in cloud_keys:
                     records_to_push.append(record)
 
+            logger.info(f"Found {local_count} records in local SQLite")
             logger.info(f"Found {len(records_to_push)} records missing in Supabase")
 
             if records_to_push and not self.dry_run:
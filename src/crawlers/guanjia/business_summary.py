@@ -1,4 +1,6 @@
 # 综合营业统计 Crawler - Extracts comprehensive business statistics
+# v1.9 - Database save runs in a worker thread (asyncio.to_thread) so it does not block the event loop
+# v1.8 - Per-row skip logs in _parse_row use lazy %-style arguments
 # v1.7 - Fixed: Increased wait time after clicking 查询 from 5s to 10s + 2s for data to load
 #        Root cause: Large date ranges need more time to fetch and render data
 # v1.6 - Fixed: Check if 按门店 is already selected before clicking to avoid unnecessary page refresh
@@ -147,7 +149,9 @@ class BusinessSummaryCrawler(BaseCrawler):
             # Step 6: Save to database
             save_stats = {"inserted": 0, "updated": 0, "skipped": 0}
             if all_data:
-                save_stats = self.db.save_business_summary(all_data, force_update=self.force_update)
+                save_stats = await asyncio.to_thread(
+                    self.db.save_business_summary, all_data, force_update=self.force_update
+                )
                 logger.info(
                     f"Database: {save_stats['inserted']} inserted, "
                     f"{save_stats['updated']} updated, {save_stats['skipped']} skipped"
@@ -647,13 +651,13 @@ class BusinessSummaryCrawler(BaseCrawler):
         # Valid business_date should be in YYYY-MM-DD or YYYY/MM/DD format
         business_date = record.get('business_date', '')
         if not self._is_valid_date(business_date):
-            logger.debug(f"Skipping row with invalid business_date: {business_date}")
+            logger.debug("Skipping row with invalid business_date: %s", business_date)
             return None
 
         # Valid store_name should not be a number (which would indicate shifted columns)
         store_name = record.get('store_name', '')
         if not store_name or store_name.isdigit():
-            logger.debug(f"Skipping row with invalid store_name: {store_name}")
+            logger.debug("Skipping row with invalid store_name: %s", store_name)
             return None
 
         # Parse composition columns (starting from column 20)
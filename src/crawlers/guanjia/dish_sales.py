@@ -1,4 +1,5 @@
 # 菜品综合统计 Crawler - Extracts dish-level sales data
+# v1.1 - Database save runs in a worker thread (asyncio.to_thread) so it does not block the event loop
 # v1.0 - Initial implementation
 #
 # This crawler extracts comprehensive dish sales statistics including:
@@ -116,7 +117,9 @@ class DishSalesCrawler(BaseCrawler):
             # Step 4: Save to database
             save_stats = {"inserted": 0, "updated": 0, "skipped": 0}
             if all_data:
-                save_stats = self.db.save_dish_sales(all_data, force_update=self.force_update)
+                save_stats = await asyncio.to_thread(
+                    self.db.save_dish_sales, all_data, force_update=self.force_update
+                )
                 logger.info(
                     f"Database: {save_stats['inserted']} inserted, "
                     f"{save_stats['updated']} updated, {save_stats['skipped']} skipped"
@@ -1,4 +1,5 @@
 # 权益包售卖汇总表 Crawler - Extracts equity package sales data
+# v3.1 - Database save runs in a worker thread (asyncio.to_thread) so it does not block the event loop
 # v3.0 - Refactored: Navigation logic moved to sites/meituan_guanjia.py
 #
 # This crawler focuses ONLY on:
@@ -101,7 +102,7 @@ class EquityPackageSalesCrawler(BaseCrawler):
             # Step 4: Save to database
             save_stats = {"inserted": 0, "updated": 0, "skipped": 0}
             if all_data:
-                save_stats = self.db.save_equity_package_sales(all_data)
+                save_stats = await asyncio.to_thread(self.db.save_equity_package_sales, all_data)
                 logger.info(
                     f"Database: {save_stats['inserted']} inserted, "
                     f"{save_stats['updated']} updated, {save_stats['skipped']} skipped"
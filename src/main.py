@@ -1,4 +1,9 @@
 # Daily Crawler - Unified entry point for multi-site crawling
+# v4.0 - Supabase upload runs in a worker thread so concurrent in-process crawls keep running
+# v3.9 - Added --dates d1,d2,...: crawl several single days in one run (one CDP connect)
+# v3.8 - run() accepts an already-connected CDPSession so batches reuse one connection
+# v3.7 - Split main() into importable run(args) / parse_args(argv) for scripts/batch_crawl.py
+# v3.6 - Exit with status 1 when any report fails (used by scripts/batch_crawl.py)
 # v3.5 - Enhanced retry logic to retry at least once for any error
 #   - All errors now get at least 1 retry attempt (not just timeouts)
 #   - Timeout errors still get up to 3 retry attempts
@@ -20,7 +25,7 @@ import argparse
 import logging
 import sys
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 
 # Add parent directory to path for imports
@@ -75,9 +80,28 @@ async def main():
     """
     Main entry point - runs crawlers based on command line arguments.
     Supports multiple reports in a single run with --report all or --report r1 r2.
+
+    Returns:
+        Process exit code: 0 if every report succeeded, 1 otherwise
     """
-    args = parse_args()
+    return await run(parse_args())
+
+
+async def run(args: argparse.Namespace, session: Optional[CDPSession] = None) -> int:
+    """
+    Run crawlers for already-parsed arguments.
+
+    Importable so callers (scripts/batch_crawl.py --in-process) can crawl many
+    dates from one interpreter instead of spawning src/main.py per date.
 
+    Args:
+        args: Namespace as returned by parse_args()
+        session: Already-connected CDP session to reuse. If None, Chrome CDP is
+                 ensured, connected for this run and closed afterwards.
+
+    Returns:
+        Process exit code: 0 if every report succeeded, 1 otherwise
+    """
     logger.info("=" * 80)
     logger.info("Meituan/Dianping Multi-Site Crawler")
     logger.info("=" * 80)
@@ -86,7 +110,7 @@ async def main():
     site_key = args.site
     if site_key not in SITES:
         logger.error(f"Unknown site: {site_key}. Available: {list(SITES.keys())}")
-        return
+        return 1
 
     site_config = SITES[site_key]
     logger.info(f"Site: {site_config['name']} ({site_key})")
@@ -101,59 +125,68 @@ async def main():
         for report_key in args.report:
             if report_key not in site_config["reports"]:
                 logger.error(f"Unknown report: {report_key}. Available for {site_key}: {available_reports}")
-                return
+                return 1
             reports_to_run.append(report_key)
 
     logger.info(f"Reports to run: {reports_to_run}")
 
-    # Determine target date
-    target_date = args.date if args.date else get_yesterday()
-    end_date = args.end_date or target_date
-    logger.info(f"Date range: {target_date} to {end_date}")
+    # Determine target date(s): --dates crawls each listed day as its own range
+    if args.dates:
+        date_ranges = [(d, d) for d in args.dates.split(',') if d]
+        logger.info(f"Dates: {', '.join(d for d, _ in date_ranges)}")
+    else:
+        target_date = args.date if args.date else get_yesterday()
+        end_date = args.end_date or target_date
+        date_ranges = [(target_date, end_date)]
+        logger.info(f"Date range: {target_date} to {end_date}")
 
     # Initialize database
     logger.info("Initializing database...")
     db = DatabaseManager()
 
-    # Ensure Chrome CDP is available
-    cdp_port = DEFAULT_CDP_PORT
-    if args.cdp:
-        cdp_url = args.cdp
-        if ":" in cdp_url.split("//")[-1]:
-            cdp_port = int(cdp_url.split(":")[-1])
-    else:
-        cdp_url = CDP_URL
-
-    # Use site-specific startup URL
-    startup_url = site_config["startup_url"]
-
-    logger.info("Ensuring Chrome CDP is available...")
-    cdp_success, was_launched = await ensure_cdp_available(
-        port=cdp_port,
-        profile_dir=DEFAULT_PROFILE_DIR,
-        startup_url=startup_url
-    )
-
-    if not cdp_success:
-        logger.error("Failed to initialize Chrome CDP")
-        return
-
-    if was_launched:
-        logger.info("Launched new Chrome instance")
-        logger.info(f"Please login to {site_config['name']} in the browser, then run again.")
-        return
-    else:
-        logger.info("Reusing existing Chrome CDP session")
+    # Reuse the caller's connection if one was passed in
+    owns_session = session is None
+    if owns_session:
+        # Ensure Chrome CDP is available
+        cdp_port = DEFAULT_CDP_PORT
+        if args.cdp:
+            cdp_url = args.cdp
+            if ":" in cdp_url.split("//")[-1]:
+                cdp_port = int(cdp_url.split(":")[-1])
+        else:
+            cdp_url = CDP_URL
+
+        # Use site-specific startup URL
+        startup_url = site_config["startup_url"]
+
+        logger.info("Ensuring Chrome CDP is available...")
+        cdp_success, was_launched = await ensure_cdp_available(
+            port=cdp_port,
+            profile_dir=DEFAULT_PROFILE_DIR,
+            startup_url=startup_url
+        )
+
+        if not cdp_success:
+            logger.error("Failed to initialize Chrome CDP")
+            return 1
+
+        if was_launched:
+            logger.info("Launched new Chrome instance")
+            logger.info(f"Please login to {site_config['name']} in the browser, then run again.")
+            return 1
+        else:
+            logger.info("Reusing existing Chrome CDP session")
 
-    # Connect to browser
-    logger.info(f"Connecting to Chrome via CDP: {cdp_url}")
-    session = CDPSession(cdp_url)
+        # Connect to browser
+        logger.info(f"Connecting to Chrome via CDP: {cdp_url}")
+        session = CDPSession(cdp_url)
 
     # Track results for all reports
     all_results = []
 
     try:
-        await session.connect()
+        if owns_session:
+            await session.connect()
         # Get page matching the site's URL pattern
         url_pattern = site_config["startup_url"].replace("https://", "").split("/")[0]
         page = await session.get_page(url_pattern=url_pattern)
@@ -163,130 +196,135 @@ async def main():
         site_class = site_config["class"]
         site = site_class(page)
 
-        # Run each report sequentially
-        for report_idx, report_key in enumerate(reports_to_run):
-            logger.info("")
-            logger.info("=" * 60)
-            logger.info(f"REPORT {report_idx + 1}/{len(reports_to_run)}: {report_key}")
-            logger.info("=" * 60)
-
-            results = {
-                "site": site_key,
-                "report": report_key,
-                "date_range": f"{target_date} to {end_date}",
-                "success": False,
-                "total_records": 0,
-                "error": None,
-                "start_time": datetime.now().isoformat()
-            }
-
-            # Retry mechanism for timeout errors
-            MAX_RETRIES = 3
-            for attempt in range(MAX_RETRIES):
-                if attempt > 0:
-                    logger.info(f"Retry attempt {attempt + 1}/{MAX_RETRIES} for {report_key}")
-
-                try:
-                    # Navigate to report using site layer
-                    logger.info(f"Navigating to report: {report_key}")
-                    if not args.skip_navigation:
-                        nav_success = await site.navigate_to_report(report_key)
-                        if not nav_success:
-                            results["error"] = "Navigation failed"
-                            # Don't retry navigation failures from other causes
-                            break
-                    else:
-                        logger.info("SKIP_NAVIGATION: Using current page state")
-
-                    # Get frame from site
-                    frame = site.get_frame()
-
-                    # Initialize and run crawler
-                    crawler_class = site_config["reports"][report_key]
-                    crawler = crawler_class(
-                        page=page,
-                        frame=frame,
-                        db_manager=db,
-                        target_date=target_date,
-                        end_date=end_date,
-                        skip_navigation=args.skip_navigation,
-                        force_update=args.force
-                    )
-
-                    logger.info(f"Running {crawler_class.__name__}...")
-                    result = await crawler.crawl()
-
-                    if result["success"]:
-                        logger.info("Crawl completed successfully")
-                        record_count = result["data"].get("record_count", 0)
-                        save_stats = result["data"].get("save_stats", {})
-                        results["success"] = True
-                        results["total_records"] = record_count
-                        results["save_stats"] = save_stats
-
-                        logger.info(
-                            f"SQLite: {save_stats.get('inserted', 0)} inserted, "
-                            f"{save_stats.get('updated', 0)} updated, "
-                            f"{save_stats.get('skipped', 0)} skipped"
+        # Run each report sequentially, for each date range in turn
+        for target_date, end_date in date_ranges:
+            for report_idx, report_key in enumerate(reports_to_run):
+                logger.info("")
+                logger.info("=" * 60)
+                logger.info(f"REPORT {report_idx + 1}/{len(reports_to_run)}: {report_key}")
+                logger.info("=" * 60)
+
+                results = {
+                    "site": site_key,
+                    "report": report_key,
+                    "date_range": f"{target_date} to {end_date}",
+                    "success": False,
+                    "total_records": 0,
+                    "error": None,
+                    "start_time": datetime.now().isoformat()
+                }
+
+                # Retry mechanism for timeout errors
+                MAX_RETRIES = 3
+                for attempt in range(MAX_RETRIES):
+                    if attempt > 0:
+                        logger.info(f"Retry attempt {attempt + 1}/{MAX_RETRIES} for {report_key}")
+
+                    try:
+                        # Navigate to report using site layer
+                        logger.info(f"Navigating to report: {report_key}")
+                        if not args.skip_navigation:
+                            nav_success = await site.navigate_to_report(report_key)
+                            if not nav_success:
+                                results["error"] = "Navigation failed"
+                                # Don't retry navigation failures from other causes
+                                break
+                        else:
+                            logger.info("SKIP_NAVIGATION: Using current page state")
+
+                        # Get frame from site
+                        frame = site.get_frame()
+
+                        # Initialize and run crawler
+                        crawler_class = site_config["reports"][report_key]
+                        crawler = crawler_class(
+                            page=page,
+                            frame=frame,
+                            db_manager=db,
+                            target_date=target_date,
+                            end_date=end_date,
+                            skip_navigation=args.skip_navigation,
+                            force_update=args.force
                         )
 
-                        # Upload to Supabase
-                        records = result["data"].get("records", [])
-                        if records and not args.no_supabase:
-                            logger.info("Uploading to Supabase...")
-                            supabase_stats = upload_to_supabase(records, report_key)
-                            results["supabase_stats"] = supabase_stats
+                        logger.info(f"Running {crawler_class.__name__}...")
+                        result = await crawler.crawl()
+
+                        if result["success"]:
+                            logger.info("Crawl completed successfully")
+                            record_count = result["data"].get("record_count", 0)
+                            save_stats = result["data"].get("save_stats", {})
+                            results["success"] = True
+                            results["total_records"] = record_count
+                            results["save_stats"] = save_stats
 
                             logger.info(
-                                f"Supabase: {supabase_stats.get('inserted', 0)} inserted, "
-                                f"{supabase_stats.get('updated', 0)} updated, "
-                                f"{supabase_stats.get('failed', 0)} failed"
+                                f"SQLite: {save_stats.get('inserted', 0)} inserted, "
+                                f"{save_stats.get('updated', 0)} updated, "
+                                f"{save_stats.get('skipped', 0)} skipped"
                             )
-                        elif args.no_supabase:
-                            logger.info("Supabase upload skipped (--no-supabase)")
-
-                        # Success - break retry loop
-                        break
-                    else:
-                        error_msg = result.get("error")
-                        logger.error(f"Crawl failed: {error_msg}")
-                        results["error"] = error_msg
-
-                        # Retry at least once for any error
-                        if attempt < 1:
-                            logger.info(f"Retrying {report_key} once for error: {error_msg}")
-                            await asyncio.sleep(2)
+
+                            # Upload to Supabase
+                            records = result["data"].get("records", [])
+                            if records and not args.no_supabase:
+                                logger.info("Uploading to Supabase...")
+                                supabase_stats = await asyncio.to_thread(upload_to_supabase, records, report_key)
+                                results["supabase_stats"] = supabase_stats
+
+                                logger.info(
+                                    f"Supabase: {supabase_stats.get('inserted', 0)} inserted, "
+                                    f"{supabase_stats.get('updated', 0)} updated, "
+                                    f"{supabase_stats.get('failed', 0)} failed"
+                                )
+                            elif args.no_supabase:
+                                logger.info("Supabase upload skipped (--no-supabase)")
+
+                            # Success - break retry loop
+                            break
+                        else:
+                            error_msg = result.get("error")
+                            logger.error(f"Crawl failed: {error_msg}")
+                            results["error"] = error_msg
+
+                            # Retry at least once for any error
+                            if attempt < 1:
+                                logger.info(f"Retrying {report_key} once for error: {error_msg}")
+                                await asyncio.sleep(2)
+                                continue
+                            else:
+                                # Already retried once, don't retry again for non-timeout errors
+                                break
+
+                    except Exception as e:
+                        error_msg = str(e)
+                        is_timeout = "Timeout" in error_msg or "timeout" in error_msg.lower()
+
+                        if is_timeout and attempt < MAX_RETRIES - 1:
+                            logger.warning(f"Timeout error on attempt {attempt + 1}/{MAX_RETRIES}: {e}")
+                            logger.info(f"Retrying {report_key} from the beginning...")
+                            await asyncio.sleep(2)  # Brief pause before retry
                             continue
                         else:
-                            # Already retried once, don't retry again for non-timeout errors
+                            # Last attempt or non-timeout error
+                            logger.error(f"Error in {report_key}: {e}", exc_info=True)
+                            results["error"] = error_msg
                             break
 
-                except Exception as e:
-                    error_msg = str(e)
-                    is_timeout = "Timeout" in error_msg or "timeout" in error_msg.lower()
-
-                    if is_timeout and attempt < MAX_RETRIES - 1:
-                        logger.warning(f"Timeout error on attempt {attempt + 1}/{MAX_RETRIES}: {e}")
-                        logger.info(f"Retrying {report_key} from the beginning...")
-                        await asyncio.sleep(2)  # Brief pause before retry
-                        continue
-                    else:
-                        # Last attempt or non-timeout error
-                        logger.error(f"Error in {report_key}: {e}", exc_info=True)
-                        results["error"] = error_msg
-                        break
-
-            results["end_time"] = datetime.now().isoformat()
-            all_results.append(results)
+                results["end_time"] = datetime.now().isoformat()
+                all_results.append(results)
 
     except Exception as e:
         logger.error(f"Fatal error: {e}", exc_info=True)
 
     finally:
-        logger.info("Closing browser connection...")
-        await session.close()
+        if owns_session:
+            logger.info("Closing browser connection...")
+            await session.close()
         print_multi_summary(all_results)
 
+    all_succeeded = bool(all_results) and all(r["success"] for r in all_results)
+    return 0 if all_succeeded else 1
+
 
 def upload_to_supabase(records: List[Dict[str, Any]], report_type: str) -> Dict[str, Any]:
     """
@@ -360,8 +398,13 @@ def print_multi_summary(all_results: List[Dict[str, Any]]) -> None:
     logger.info("=" * 80)
 
 
-def parse_args():
-    """Parse command line arguments."""
+def parse_args(argv: List[str] = None):
+    """
+    Parse command line arguments.
+
+    Args:
+        argv: Argument list to parse (default: sys.argv[1:])
+    """
     parser = argparse.ArgumentParser(
         description='Meituan/Dianping Multi-Site Crawler',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -382,6 +425,9 @@ Examples:
   # Specific date
   python src/main.py --date 2025-12-13
 
+  # Several single days in one run (used by scripts/batch_crawl.py --chunk-size)
+  python src/main.py --report all --dates 2025-12-13,2025-12-14,2025-12-15
+
   # Skip navigation (debugging)
   python src/main.py --skip-navigation
 
@@ -427,6 +473,13 @@ Examples:
         help='End date for range (default: same as start)'
     )
 
+    parser.add_argument(
+        '--dates',
+        type=str,
+        default=None,
+        help='Comma-separated dates YYYY-MM-DD, each crawled as a single day (overrides --date/--end-date)'
+    )
+
     parser.add_argument(
         '--force',
         action='store_true',
@@ -445,8 +498,8 @@ Examples:
         help='Skip Supabase upload'
     )
 
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    sys.exit(asyncio.run(main()))